@@ -1,9 +1,13 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+import pyarrow as pa
+import hashlib
 import os
+import shutil
 
-def generate_marketing_star_schema(output_dir='../docs'):
+SCHEMA_FILES = ['dim_date.parquet', 'dim_source.parquet', 'dim_campaign.parquet', 'fact_performance.parquet']
+
+def generate_marketing_star_schema(output_dir='../docs', seed=42, use_cache=True):
     """
     Generates a synthetic marketing dataset structured as a Star Schema 
     suitable for BI tools (Tableau, PowerBI, Looker).
@@ -15,26 +19,54 @@ def generate_marketing_star_schema(output_dir='../docs'):
     4. DIM_CAMPAIGN: Campaign objectives and hierarchy
 
     Args:
-        output_dir (str): The directory where CSV files will be saved. 
+        output_dir (str): The directory where Parquet files will be saved. 
                           Defaults to current directory.
+        seed (int): Seed for the random generator, so reruns are reproducible.
+                    Defaults to 42.
+        use_cache (bool): Reuse files from output_dir/_cache when this exact
+                          script and seed have generated them before.
+                          Defaults to True.
     """
     print(f"Initializing Data Generation... Target Directory: {os.path.abspath(output_dir)}")
 
+    if use_cache:
+        # Output is determined by this script (configs, date range, logic), the seed, and
+        # the library versions (NumPy's Generator stream and the Parquet writers are not
+        # guaranteed stable across releases), so all of them go into the cache key
+        with open(__file__, 'rb') as f:
+            key_bytes = f.read()
+        key_bytes += f"{seed}|{np.__version__}|{pd.__version__}|{pa.__version__}".encode()
+        cache_key = hashlib.blake2b(key_bytes, digest_size=8).hexdigest()
+        cache_dir = os.path.join(output_dir, '_cache', cache_key)
+
+        if all(os.path.exists(os.path.join(cache_dir, name)) for name in SCHEMA_FILES):
+            for name in SCHEMA_FILES:
+                shutil.copy2(os.path.join(cache_dir, name), os.path.join(output_dir, name))
+            print(f"SUCCESS: 4 Star Schema files restored from cache ({cache_key})!")
+            print(f"Files saved to: {os.path.abspath(output_dir)}")
+            return
+
+    # Single PCG64 generator for every random draw below
+    rng = np.random.default_rng(seed)
+
     # ==========================================
     # I. GENERATE DIMENSIONS (Metadata)
     # ==========================================
     
     # --- DIM_DATE (15 Months: Jan 2023 - Mar 2024) ---
     # Generating a daily grain for time-series analysis
-    start_date = datetime(2023, 1, 1)
-    dates = [start_date + timedelta(days=x) for x in range(456)] 
+    dates = pd.date_range('2023-01-01', periods=456, freq='D')
     dim_date = pd.DataFrame({'date': dates})
     
     # Integer keys are preferred in data warehousing for performance
-    dim_date['date_key'] = dim_date['date'].dt.strftime('%Y%m%d').astype(int)
+    # (YYYYMMDD built arithmetically, avoiding a strftime/parse round-trip)
     dim_date['year'] = dim_date['date'].dt.year
     dim_date['month'] = dim_date['date'].dt.month
-    dim_date['month_name'] = dim_date['date'].dt.strftime('%b')
+    dim_date.insert(1, 'date_key', (
+        dim_date['year'] * 10000 + dim_date['month'] * 100 + dim_date['date'].dt.day
+    ).astype(np.int32))
+    month_abbr = np.array(['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'])
+    dim_date['month_name'] = month_abbr[dim_date['month'].to_numpy() - 1]
     dim_date['quarter'] = dim_date['date'].dt.quarter
     dim_date['is_weekend'] = dim_date['date'].dt.dayofweek >= 5
 
@@ -50,6 +82,7 @@ def generate_marketing_star_schema(output_dir='../docs'):
         (8, 'Organic Search', 'Organic')
     ]
     dim_source = pd.DataFrame(sources_data, columns=['source_id', 'source_name', 'channel'])
+    dim_source['source_id'] = dim_source['source_id'].astype(np.int32)
 
     # --- DIM_CAMPAIGN (Mapped to Channel & Objective) ---
     # Campaigns are scoped to specific channels to ensure logical consistency 
@@ -65,22 +98,17 @@ def generate_marketing_star_schema(output_dir='../docs'):
         ("Cross-platform static hierarchy", "Organic", "Traffic")
     ]
     
-    campaign_rows = []
-    id_counter = 1
-    
-    for name, scope, objective in campaign_config:
-        # Create 2 Ad Sets per Campaign to enable hierarchy testing in Tableau
-        for tier in ['_Tier1', '_Tier2']:
-            campaign_rows.append({
-                'campaign_id': id_counter,
-                'campaign_name': name, 
-                'ad_set_name': f"{name}{tier}", 
-                'channel_scope': scope, # Helper for generation only
-                'objective': objective
-            })
-            id_counter += 1
-            
-    dim_campaign = pd.DataFrame(campaign_rows)
+    # Create 2 Ad Sets per Campaign to enable hierarchy testing in Tableau
+    names, scopes, objectives = (np.array(col) for col in zip(*campaign_config))
+    tiers = ['_Tier1', '_Tier2']
+    campaign_names = np.repeat(names, len(tiers))
+    dim_campaign = pd.DataFrame({
+        'campaign_id': np.arange(1, len(campaign_names) + 1, dtype=np.int32),
+        'campaign_name': campaign_names,
+        'ad_set_name': np.char.add(campaign_names, np.tile(tiers, len(names))),
+        'channel_scope': np.repeat(scopes, len(tiers)), # Helper for generation only
+        'objective': np.repeat(objectives, len(tiers)),
+    })
 
     # ==========================================
     # II. GENERATE FACT TABLE 
@@ -88,89 +116,99 @@ def generate_marketing_star_schema(output_dir='../docs'):
     
     # Step A: Link Campaigns to Sources (Logical Join)
     schema_link = dim_campaign.merge(dim_source, left_on='channel_scope', right_on='channel')
+
+    # Categorical channel so the masks below compare small integer codes, not strings
+    channel_order = ['Programmatic', 'Paid Search', 'Paid Social', 'Organic']
+    schema_link['channel'] = pd.Categorical(schema_link['channel'], categories=channel_order)
+    prog_code, search_code, social_code, _ = range(len(channel_order))
     
-    # Step B: Cross Join with Date to create the full time-series skeleton
-    # ~20k rows (16 campaigns * relevant sources * 456 days)
-    df_fact = schema_link.merge(dim_date[['date_key', 'is_weekend', 'year', 'month']], how='cross')
-    N = len(df_fact)
+    # Step B: Cross the links with Date to create the full time-series skeleton
+    # ~20k rows (16 campaigns * relevant sources * 456 days). Built from row indices
+    # rather than a cross merge so no string columns are duplicated per day
+    n_links, n_days = len(schema_link), len(dim_date)
+    N = n_links * n_days
+    link_idx = np.repeat(np.arange(n_links), n_days)
+    date_idx = np.tile(np.arange(n_days), n_links)
+
+    codes = schema_link['channel'].cat.codes.to_numpy()[link_idx]
+    dk = dim_date['date_key'].to_numpy()[date_idx]
+    is_weekend = dim_date['is_weekend'].to_numpy()[date_idx]
+    source_ids = schema_link['source_id'].to_numpy()[link_idx]
+    campaign_ids = schema_link['campaign_id'].to_numpy()[link_idx]
 
     # Step C: Vectorized Metric Logic
     # ---------------------------------------------------------
     # 1. Seasonality Mask: Apply a multiplier to simulate lower traffic on weekends
-    seasonality = np.where(df_fact['is_weekend'], 0.7, 1.1)
-
-    # 2. Initialize Metric Arrays
-    base_imps = np.zeros(N)
-    ctrs = np.zeros(N)
-    cpcs = np.zeros(N)
-
-    # 3. Apply Channel-Specific Distributions (The "Realism" Layer)
-    # We use boolean masking for performance rather than iterating rows
-    
-    # Programmatic: High Volume, Low CTR, Low CPC
-    mask_prog = df_fact['channel'] == 'Programmatic'
-    s_prog = mask_prog.sum()
-    base_imps[mask_prog] = np.random.randint(5000, 15000, s_prog)
-    ctrs[mask_prog] = np.random.uniform(0.003, 0.007, s_prog) # ~0.5% CTR
-    cpcs[mask_prog] = np.random.uniform(0.30, 0.90, s_prog)
-
-    # Search: Low Volume, High CTR, High CPC
-    mask_search = df_fact['channel'] == 'Paid Search'
-    s_search = mask_search.sum()
-    base_imps[mask_search] = np.random.randint(300, 1200, s_search)
-    ctrs[mask_search] = np.random.uniform(0.08, 0.12, s_search) # ~10% CTR
-    cpcs[mask_search] = np.random.uniform(2.50, 6.00, s_search)
-
-    # Social: Mid Volume, Mid CTR, Mid CPC
-    mask_social = df_fact['channel'] == 'Paid Social'
-    s_social = mask_social.sum()
-    base_imps[mask_social] = np.random.randint(1000, 4000, s_social)
-    ctrs[mask_social] = np.random.uniform(0.015, 0.035, s_social) # ~2.5% CTR
-    cpcs[mask_social] = np.random.uniform(1.50, 3.50, s_social)
-
-    # Organic: No Cost
-    mask_org = df_fact['channel'] == 'Organic'
-    s_org = mask_org.sum()
-    base_imps[mask_org] = np.random.randint(1000, 3000, s_org)
-    ctrs[mask_org] = np.random.uniform(0.05, 0.08, s_org)
-    cpcs[mask_org] = 0.0
+    seasonality = np.where(is_weekend, 0.7, 1.1)
+
+    # 2. Channel-Specific Distributions (The "Realism" Layer)
+    # One parameter row per channel code; indexing by `codes` expands them to
+    # per-row bounds so each metric is drawn in a single vectorized pass
+    #                    Programmatic  Search  Social  Organic
+    imp_lo = np.array([5000,         300,    1000,   1000])
+    imp_hi = np.array([15000,        1200,   4000,   3000])
+    ctr_lo = np.array([0.003,        0.08,   0.015,  0.05])   # ~0.5% / ~10% / ~2.5% CTR
+    ctr_hi = np.array([0.007,        0.12,   0.035,  0.08])
+    cpc_lo = np.array([0.30,         2.50,   1.50,   0.0])    # Organic: No Cost
+    cpc_hi = np.array([0.90,         6.00,   3.50,   0.0])
+
+    # 3. Draw Metrics (High Volume/Low CTR Programmatic, Low Volume/High CPC Search, ...)
+    base_imps = rng.integers(imp_lo[codes], imp_hi[codes])
+    ctrs = rng.uniform(ctr_lo[codes], ctr_hi[codes])
+    cpcs = rng.uniform(cpc_lo[codes], cpc_hi[codes])
   
     # 4. Inject Strategic Insights (The "Story" Layer)
     final_imps = base_imps * seasonality
     
     # INSIGHT 1: "The August Spike" - Programmatic impressions triple in Aug '23
-    mask_spike = (df_fact['year'] == 2023) & (df_fact['month'] == 8) & (df_fact['channel'] == 'Programmatic')
+    # date_key is YYYYMMDD, so a calendar month is a single integer range
+    mask_spike = (dk >= 20230801) & (dk <= 20230831) & (codes == prog_code)
     final_imps[mask_spike] *= 3.0
     
     # INSIGHT 2: "December Efficiency" - Search CPC drops 30% in Dec '23 (Bid Optimization)
-    mask_effic = (df_fact['year'] == 2023) & (df_fact['month'] == 12) & (df_fact['channel'] == 'Paid Search')
+    mask_effic = (dk >= 20231201) & (dk <= 20231231) & (codes == search_code)
     cpcs[mask_effic] *= 0.7
 
     # 5. Final Calculations
-    df_fact['impressions'] = final_imps.astype(int)
-    df_fact['clicks'] = (df_fact['impressions'] * ctrs).astype(int)
-    df_fact['spend'] = (df_fact['clicks'] * cpcs).round(2)
+    # Metrics stay as plain numpy arrays until export, so pandas never has to
+    # align or re-consolidate a frame on each column assignment.
+    # Counts peak well below 2^31, so int32 halves their memory and bandwidth.
+    # Spend stays float64: float32 cannot hold cent-rounded values exactly
+    impressions = final_imps.astype(np.int32)
+    clicks = (impressions * ctrs).astype(np.int32)
+    spend = (clicks * cpcs).round(2)
     
     # Conversion Rate (Randomized between 5% and 15%)
-    conv_rates = np.random.uniform(0.05, 0.15, N)
-    df_fact['conversions'] = (df_fact['clicks'] * conv_rates).astype(int)
+    conv_rates = rng.uniform(0.05, 0.15, N)
+    conversions = (clicks * conv_rates).astype(np.int32)
     
     # Video Views (Only relevant for Display/Social channels)
-    df_fact['video_views'] = 0
-    mask_video = df_fact['channel'].isin(['Programmatic', 'Paid Social'])
+    video_lut = np.zeros(len(channel_order), dtype=bool)
+    video_lut[[prog_code, social_code]] = True
+    mask_video = video_lut[codes]
     
-# Logic: ~40% of impressions are video, with some variance
-    df_fact.loc[mask_video, 'video_views'] = (
-        df_fact.loc[mask_video, 'impressions'] * 0.40 * np.random.uniform(0.8, 1.2, mask_video.sum())
-    ).astype(int)
+    # Logic: ~40% of impressions are video, with some variance
+    video_views = np.zeros(N, dtype=np.int32)
+    video_views[mask_video] = (
+        impressions[mask_video] * 0.40 * rng.uniform(0.8, 1.2, mask_video.sum())
+    ).astype(np.int32)
 
     # ==========================================
-    # III. EXPORT (4 Clean CSVs)
+    # III. EXPORT (4 Clean Parquet Files)
     # ==========================================
     
-    # Select only keys and metrics for the Fact Table (Star Schema Best Practice)
-    fact_columns = ['date_key', 'source_id', 'campaign_id', 'impressions', 'clicks', 'spend', 'conversions', 'video_views']
-    fact_final = df_fact[fact_columns]
+    # Keep only keys and metrics for the Fact Table (Star Schema Best Practice),
+    # wrapping the finished arrays in a single construction without copying them
+    fact_final = pd.DataFrame({
+        'date_key': dk,
+        'source_id': source_ids,
+        'campaign_id': campaign_ids,
+        'impressions': impressions,
+        'clicks': clicks,
+        'spend': spend,
+        'conversions': conversions,
+        'video_views': video_views,
+    }, copy=False)
 
     # Clean up dimensions (remove helper columns used for generation logic)
     dim_campaign_final = dim_campaign.drop(columns=['channel_scope'])
@@ -179,11 +217,17 @@ def generate_marketing_star_schema(output_dir='../docs'):
     if output_dir and not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    # Save to CSV
-    dim_date.to_csv(os.path.join(output_dir, 'dim_date.csv'), index=False)
-    dim_source.to_csv(os.path.join(output_dir, 'dim_source.csv'), index=False)
-    dim_campaign_final.to_csv(os.path.join(output_dir, 'dim_campaign.csv'), index=False)
-    fact_final.to_csv(os.path.join(output_dir, 'fact_performance.csv'), index=False)
+    # Save to Parquet (typed, columnar and snappy-compressed: no dtype inference on reload)
+    parquet_options = {'engine': 'pyarrow', 'compression': 'snappy', 'index': False}
+    dim_date.to_parquet(os.path.join(output_dir, 'dim_date.parquet'), **parquet_options)
+    dim_source.to_parquet(os.path.join(output_dir, 'dim_source.parquet'), **parquet_options)
+    dim_campaign_final.to_parquet(os.path.join(output_dir, 'dim_campaign.parquet'), **parquet_options)
+    fact_final.to_parquet(os.path.join(output_dir, 'fact_performance.parquet'), **parquet_options)
+
+    if use_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        for name in SCHEMA_FILES:
+            shutil.copy2(os.path.join(output_dir, name), os.path.join(cache_dir, name))
     
     print("SUCCESS: 4 Star Schema files generated!")
     print(f"Fact Table rows: {len(fact_final)}")